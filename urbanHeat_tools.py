@@ -1,23 +1,79 @@
-import arcpy
 import os
-import shutil
+import re
+import math
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import ExitStack
+from functools import lru_cache, partial
+from pathlib import Path
+
+import geopandas as gpd
+import numpy as np
+import rasterio
+import shapely
+from numba import cuda, njit, prange, set_num_threads
+from rasterio.crs import CRS
+from rasterio.enums import Resampling
+from rasterio.errors import RasterioIOError
+from rasterio.transform import from_origin
+from rasterio.warp import reproject
+from rasterio.windows import Window
 
 ## Download Raster Data
 ## Download CAPA Transect Data from https://osf.io/nqwyr/?view_only=
 
+def _ensure_folder(folder):
+    """
+    Creates a folder and its parents if they do not exist. Unlike an exists/makedirs check this is a
+    single call and does not fail when several workers create the same folder at once.
+    """
+    Path(folder).mkdir(parents=True, exist_ok=True)
+
+def _up_to_date(output, inputs, **tags):
+    """
+    Checks whether an output can be reused: it exists, is at least as new as every input and, for rasters,
+    carries the tags of the settings it was made with. Tags are written last and an unreadable output is not
+    reused, so an interrupted write is redone.
+    
+    Parameters:
+        output (str): Path of the output file.
+        inputs (list): Paths of the input files.
+        **tags: Settings recorded as raster tags when the output was written.
+        
+    Returns:
+        bool
+    """
+    try:
+        mtime = Path(output).stat().st_mtime
+    except FileNotFoundError:
+        return False
+    if any(Path(path).stat().st_mtime > mtime for path in inputs):
+        return False
+    if tags:
+        try:
+            with rasterio.open(output) as src:
+                written = src.tags()
+        except RasterioIOError:
+            return False
+        return all(written.get(key) == str(value) for key, value in tags.items())
+    return True
+
 def create_file_structure(project_directory = os.getcwd()):
     '''
     Creates filestructure for data analysis
     '''
-    folders = ['sentinel_rasters', 'CAPA_transects', 'CAPA_rasters', 'focal_rasters', 'resampled_rasters', 'shapefiles', 'fishnet']
+    folders = ['sentinel_rasters', 'CAPA_transects', 'CAPA_rasters', 'focal_rasters', 'stacked_rasters', 'resampled_rasters', 'shapefiles', 'fishnet']
     for folder in folders:
-        if not os.path.exists(os.path.join(project_directory, folder)):
-            os.makedirs(os.path.join(project_directory, folder))
+        try:
+            Path(project_directory, folder).mkdir(parents=True)
             print(f'Created new directory: {folder}')
-        else:
+        except FileExistsError:
             print(f'{folder} already exists.')
         
 
+# Downloaded Sentinel file names: the 5th to 7th underscore-separated parts (the 5th starting with
+# "Sentinel") are kept along with the extension, e.g. ..._Sentinel-2_L2A_B04_(Raw).tiff -> Sentinel-2_L2A_B04.tiff
+_SENTINEL_NAME = re.compile(r"(?:[^_]*_){4}(Sentinel[^_]*_[^_]*_[^_.]*).*?(\.[^.]*)?")
+
 def rename_rasters(input_folder):
     """
     Renames all Sentinel data so that it is easier to read.
@@ -28,175 +84,858 @@ def rename_rasters(input_folder):
     Returns:
         None
     """
-    for file in os.listdir(input_folder):
-        try:
-            if file.split("_")[4].startswith('Sentinel'):
-                file_ext = os.path.splitext(file)[1]
-                parts = file.split("_")
-                new_file = f"{parts[4]}_{parts[5]}_{parts[6]}{file_ext}"
-                os.rename(os.path.join(input_folder, file), os.path.join(input_folder, new_file))
-                print(f"Renamed '{file}' to '{new_file}'")
-            else:
-                pass
-        except:
+    # Collect the renames first so the folder is not modified while it is being scanned. The new names drop
+    # the dates, so a name already in the folder or claimed by an earlier file is left alone
+    with os.scandir(input_folder) as entries:
+        files = [entry.name for entry in entries]
+    taken = set(files)
+    renames = []
+    for file in files:
+        match = _SENTINEL_NAME.fullmatch(file)
+        if not match:
+            continue
+        new_file = f"{match[1]}{match[2] or ''}"
+        if new_file in taken:
             print(f"{file} not renamed.")
+        else:
+            taken.add(new_file)
+            renames.append((file, new_file))
+
+    for file, new_file in renames:
+        os.rename(os.path.join(input_folder, file), os.path.join(input_folder, new_file))
+        print(f"Renamed '{file}' to '{new_file}'")
+
+# arcpy resampling techniques and their rasterio equivalents
+_RESAMPLING = {"NEAREST": Resampling.nearest, "BILINEAR": Resampling.bilinear, "CUBIC": Resampling.cubic, "MAJORITY": Resampling.mode}
 
-def apply_resampling(input_folder, output_folder, cellsize="10", resampling_type="NEAREST"):
+def _resample_one(raster, input_folder, output_folder, cellsize, resampling_type, num_threads):
     """
-    Resamples all rasters in a folder to specified grid size.
+    Worker for apply_resampling. Resamples one raster with GDAL's warper, keeping its origin and CRS.
+    
+    Parameters:
+        raster (str): Raster file name in input_folder.
+        input_folder (str): The folder containing the input rasters.
+        output_folder (str): The folder where the output raster will be saved.
+        cellsize (): Cell size of the new raster, "x" or "x y".
+        resampling_type (str): Specifies the resampling technique to be used.
+        num_threads (int): Number of warper threads.
+        
+    Returns:
+        str: Path of the output raster.
+    """
+    # Define output raster path
+    output_raster = os.path.join(output_folder, f"resampled_{os.path.splitext(raster)[0]}.tif")
+    sizes = str(cellsize).split()
+    cell_x, cell_y = float(sizes[0]), float(sizes[-1])
+    
+    with rasterio.open(os.path.join(input_folder, raster)) as src:
+        left, bottom, right, top = src.bounds
+        profile = _output_profile(src.profile, src.dtypes[0])
+        profile.update(
+            width=max(1, round((right - left) / cell_x)),
+            height=max(1, round((top - bottom) / cell_y)),
+            transform=from_origin(left, top, cell_x, cell_y))
+        
+        # Resample band by band, letting the warper chunk the work
+        with rasterio.open(output_raster, 'w', **profile) as dst:
+            for band in range(1, src.count + 1):
+                reproject(
+                    source=rasterio.band(src, band),
+                    destination=rasterio.band(dst, band),
+                    dst_transform=dst.transform,
+                    dst_crs=src.crs,
+                    dst_nodata=src.nodata,
+                    resampling=_RESAMPLING[resampling_type],
+                    num_threads=num_threads,
+                    warp_mem_limit=512)
+            _build_overviews(dst)
+            dst.update_tags(cellsize=cellsize, resampling_type=resampling_type)
+    return output_raster
+
+def apply_resampling(input_folder, output_folder, cellsize="10", resampling_type="NEAREST", max_workers=None):
+    """
+    Resamples all rasters in a folder to specified grid size. Rasters are resampled in parallel threads.
     
     Parameters:
         input_folder (str): The folder containing the input rasters.
         output_folder (str): The folder where the output rasters will be saved.
-        cellsize (): Cell size of the new raster (default is "10").
-        resampling_type (str): Specifies the resampling technique to be used (default is "NEAREST").
+        cellsize (): Cell size of the new raster, "x" or "x y" (default is "10").
+        resampling_type (str): Specifies the resampling technique to be used: "NEAREST", "BILINEAR", "CUBIC" or "MAJORITY" (default is "NEAREST").
+        max_workers (int): Number of rasters resampled at once (default is up to 8, one per raster).
         
     Returns:
         None
     """
-    # Set up environment settings
-    arcpy.env.workspace = input_folder
-    arcpy.env.overwriteOutput = True
+    if resampling_type not in _RESAMPLING:
+        raise ValueError(f"Unsupported resampling type: {resampling_type}")
     
     # List all rasters in the input folder
-    rasters = arcpy.ListRasters()
+    rasters = _list_rasters(input_folder)
     print(rasters)
     # Ensure the output folder exists
-    if not os.path.exists(output_folder):
-        os.makedirs(output_folder)
+    _ensure_folder(output_folder)
     
-    # Process each raster
+    # Skip rasters whose output is newer than the input and was made with the same settings
+    pending = []
     for raster in rasters:
-        # Define output raster path
         output_raster = os.path.join(output_folder, f"resampled_{os.path.splitext(raster)[0]}.tif")
-        
-        # Resample
-        arcpy.Resample_management(
-            in_raster=raster,
-            out_raster=output_raster,
-            cell_size=cellsize,
-            resampling_type='NEAREST')
-                
-        # Save the output raster
-        print(f"Processed {raster}, resampled to {cellsize} and saved to {output_raster}")  
-
-def apply_focal_statistics(input_folder, output_folder, radius, statistic_type="MEAN"):
+        if _up_to_date(output_raster, [os.path.join(input_folder, raster)], cellsize=cellsize, resampling_type=resampling_type):
+            print(f"Skipped {raster} (up-to-date)")
+        else:
+            pending.append(raster)
+    rasters = pending
+    
+    # Process the rasters in threads (GDAL releases the GIL), sharing the cores between rasters and warper threads
+    max_workers = max_workers or max(1, min(8, len(rasters)))
+    resample = partial(_resample_one, input_folder=input_folder, output_folder=output_folder, cellsize=cellsize,
+                       resampling_type=resampling_type, num_threads=max(1, os.cpu_count() // max_workers))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for raster, output_raster in zip(rasters, executor.map(resample, rasters)):
+            print(f"Processed {raster}, resampled to {cellsize} and saved to {output_raster}")
+
+# File extensions picked up as rasters when listing a folder
+_RASTER_EXTENSIONS = ('.tif', '.tiff', '.img')
+
+def _list_rasters(folder):
+    """
+    Lists the rasters in a folder (replaces arcpy.ListRasters, which requires changing the workspace).
+
+    Parameters:
+        folder (str): The folder to search.
+
+    Returns:
+        list: Sorted raster file names.
+    """
+    return sorted(file for file in os.listdir(folder) if file.lower().endswith(_RASTER_EXTENSIONS))
+
+def _output_profile(profile, dtype):
+    """
+    Profile for rasters written by this module: tiled, LZW-compressed GeoTIFF. Float rasters use the
+    floating-point predictor and integer rasters horizontal differencing, which both compress smooth surfaces well.
+    Rasters that could pass 4 GB uncompressed, like large stacks, are written as BigTIFF, since GDAL never
+    switches a compressed file to BigTIFF on its own.
+
+    Parameters:
+        profile (dict): Profile of the source raster.
+        dtype (str): Data type of the output raster.
+
+    Returns:
+        dict
+    """
+    profile = dict(profile)
+    profile.update(driver='GTiff', dtype=dtype, tiled=True, blockxsize=512, blockysize=512, compress='LZW',
+                   predictor=3 if np.issubdtype(dtype, np.floating) else 2, BIGTIFF='IF_SAFER')
+    return profile
+
+# Overview decimation factors built for every raster written by this module
+_OVERVIEW_LEVELS = [2, 4, 8, 16]
+
+def _build_overviews(dst):
+    """
+    Builds internal overviews so the raster can be displayed or read at a coarser resolution without a full read.
+
+    Parameters:
+        dst (DatasetWriter): Raster open for writing, after all data has been written.
+
+    Returns:
+        None
+    """
+    levels = [level for level in _OVERVIEW_LEVELS if min(dst.width, dst.height) // level > 0]
+    dst.build_overviews(levels, Resampling.nearest)
+    dst.update_tags(ns='rio_overview', resampling='nearest')
+
+def _tile_windows(src, tile_size):
+    """
+    Splits a raster into windows whose size is a multiple of the raster's internal block size.
+
+    Parameters:
+        src (DatasetReader): Open rasterio dataset.
+        tile_size (int): Approximate tile edge length in cells.
+
+    Returns:
+        generator of Window
+    """
+    block_rows, block_cols = src.block_shapes[0]
+    tile_rows = max(block_rows, tile_size // block_rows * block_rows)
+    tile_cols = max(block_cols, tile_size // block_cols * block_cols)
+    for row_off in range(0, src.height, tile_rows):
+        for col_off in range(0, src.width, tile_cols):
+            yield Window(col_off, row_off, min(tile_cols, src.width - col_off), min(tile_rows, src.height - row_off))
+
+@lru_cache(maxsize=None)
+def _open_raster(path):
+    """
+    Opens a raster once per worker process and keeps the handle for later tiles.
+    """
+    return rasterio.open(path)
+
+def _read_block(path, block_row, block_col):
+    """
+    Reads one internal block of band 1 of a raster. NoData is NaN.
+
+    Parameters:
+        path (str): Path to the raster.
+        block_row (int): Row index of the block.
+        block_col (int): Column index of the block.
+
+    Returns:
+        numpy.ndarray (float32)
+    """
+    src = _open_raster(path)
+    block_rows, block_cols = src.block_shapes[0]
+    window = Window(block_col * block_cols, block_row * block_rows,
+                    min(block_cols, src.width - block_col * block_cols), min(block_rows, src.height - block_row * block_rows))
+    return src.read(1, window=window, masked=True).astype('float32').filled(np.nan)
+
+# Block reader used by _read_padded. Worker processes replace it with an LRU-cached version (see _init_worker)
+# so the blocks a tile shares with its neighbor are read from disk only once.
+_cached_read_block = _read_block
+
+def _block_cache_size(src, window, pad):
+    """
+    Number of blocks covering one padded tile, which is enough to keep the overlap with the next tile in memory.
+
+    Parameters:
+        src (DatasetReader): Open rasterio dataset.
+        window (Window): A full-size tile of the raster.
+        pad (int): Number of cells added on every side of the tile.
+
+    Returns:
+        int
+    """
+    block_rows, block_cols = src.block_shapes[0]
+    return (math.ceil((window.height + 2 * pad) / block_rows) + 1) * (math.ceil((window.width + 2 * pad) / block_cols) + 1)
+
+def _read_padded(path, window, pad):
+    """
+    Reads a window of band 1 grown by pad cells on every side. NoData and cells outside the raster are NaN.
+    The window is assembled from the raster's internal blocks.
+
+    Parameters:
+        path (str): Path to the raster.
+        window (Window): Window to read.
+        pad (int): Number of cells to add on every side of the window.
+
+    Returns:
+        numpy.ndarray (float32)
+    """
+    src = _open_raster(path)
+    block_rows, block_cols = src.block_shapes[0]
+    top, left = int(window.row_off) - pad, int(window.col_off) - pad
+    arr = np.full((int(window.height) + 2 * pad, int(window.width) + 2 * pad), np.nan, dtype='float32')
+
+    # Cells of the padded window that fall on the raster
+    row_start, row_stop = max(top, 0), min(top + arr.shape[0], src.height)
+    col_start, col_stop = max(left, 0), min(left + arr.shape[1], src.width)
+    for block_row in range(row_start // block_rows, (row_stop - 1) // block_rows + 1):
+        for block_col in range(col_start // block_cols, (col_stop - 1) // block_cols + 1):
+            block = _cached_read_block(path, block_row, block_col)
+            block_top, block_left = block_row * block_rows, block_col * block_cols
+            r0, r1 = max(row_start, block_top), min(row_stop, block_top + block.shape[0])
+            c0, c1 = max(col_start, block_left), min(col_stop, block_left + block.shape[1])
+            arr[r0 - top:r1 - top, c0 - left:c1 - left] = block[r0 - block_top:r1 - block_top, c0 - block_left:c1 - block_left]
+    return arr
+
+# Radii above this many cells use the summed-area table instead of the direct kernel. The summed-area
+# table costs one 4-corner difference per rectangle of the neighborhood instead of one add per cell,
+# which is already cheaper than the direct kernel at about 6 cells. This was measured on the CPU only.
+_SAT_MIN_RADIUS = 5
+
+# Neighborhood shapes, named after arcpy's NbrCircle and NbrRectangle
+_NEIGHBORHOODS = ("CIRCLE", "RECTANGLE")
+
+def _init_worker(threads, cache_blocks):
+    """
+    Initializer for focal statistics worker processes. Limits Numba threads so workers do not oversubscribe
+    the CPU and sets up the block cache used by _read_padded.
+    """
+    global _cached_read_block
+    set_num_threads(threads)
+    _cached_read_block = lru_cache(maxsize=cache_blocks)(_read_block)
+
+@lru_cache(maxsize=None)
+def _neighborhood_mask(radius, neighborhood):
+    """
+    Boolean mask of the neighborhood cells. "CIRCLE" is equivalent to NbrCircle(radius, "CELL"),
+    "RECTANGLE" to NbrRectangle(2 * radius + 1, 2 * radius + 1, "CELL").
+
+    Parameters:
+        radius (int): Neighborhood radius in cells.
+        neighborhood (str): "CIRCLE" or "RECTANGLE".
+
+    Returns:
+        numpy.ndarray (bool) of shape (2 * radius + 1, 2 * radius + 1)
+    """
+    if neighborhood == "RECTANGLE":
+        return np.ones((2 * radius + 1, 2 * radius + 1), dtype=bool)
+    offsets = np.arange(-radius, radius + 1)
+    return offsets[:, None] ** 2 + offsets[None, :] ** 2 <= radius * radius
+
+@lru_cache(maxsize=None)
+def _neighborhood_rectangles(radius, neighborhood):
+    """
+    Decomposes the neighborhood into rectangles of consecutive rows with the same half width.
+    A "RECTANGLE" neighborhood is a single rectangle, so its mean costs the same at any radius.
+
+    Parameters:
+        radius (int): Neighborhood radius in cells.
+        neighborhood (str): "CIRCLE" or "RECTANGLE".
+
+    Returns:
+        list: (first row offset, last row offset, half width) for each rectangle.
+    """
+    if neighborhood == "RECTANGLE":
+        return [(-radius, radius, radius)]
+    rectangles = []
+    for di in range(-radius, radius + 1):
+        half_width = math.isqrt(radius * radius - di * di)
+        if rectangles and rectangles[-1][2] == half_width:
+            rectangles[-1] = (rectangles[-1][0], di, half_width)
+        else:
+            rectangles.append((di, di, half_width))
+    return rectangles
+
+@njit(parallel=True, cache=True)
+def _focal_mean(arr, mask, out):
+    """
+    Mean of the masked neighborhood around each cell, ignoring NaN.
+
+    Parameters:
+        arr (numpy.ndarray): Input array padded by mask.shape[0] // 2 cells on every side.
+        mask (numpy.ndarray): Boolean neighborhood mask, see _neighborhood_mask.
+        out (numpy.ndarray): Output array with the padding removed.
+    """
+    size = mask.shape[0]
+    for i in prange(out.shape[0]):
+        for j in range(out.shape[1]):
+            total = 0.0
+            count = 0
+            for di in range(size):
+                for dj in range(size):
+                    if mask[di, dj]:
+                        value = arr[i + di, j + dj]
+                        if not np.isnan(value):
+                            total += value
+                            count += 1
+            out[i, j] = total / count if count > 0 else np.nan
+
+@cuda.jit
+def _focal_mean_cuda(arr, mask, out):
+    """
+    CUDA version of _focal_mean. Each thread computes one output cell.
+
+    Parameters:
+        arr (DeviceNDArray): Input array padded by mask.shape[0] // 2 cells on every side.
+        mask (DeviceNDArray): Boolean neighborhood mask, see _neighborhood_mask.
+        out (DeviceNDArray): Output array with the padding removed.
+    """
+    i, j = cuda.grid(2)
+    if i >= out.shape[0] or j >= out.shape[1]:
+        return
+    size = mask.shape[0]
+    total = 0.0
+    count = 0
+    for di in range(size):
+        for dj in range(size):
+            if mask[di, dj]:
+                value = arr[i + di, j + dj]
+                if not math.isnan(value):
+                    total += value
+                    count += 1
+    out[i, j] = total / count if count > 0 else math.nan
+
+@lru_cache(maxsize=None)
+def _cuda_available():
+    """
+    Checks once per process whether a CUDA GPU can be used.
+    """
+    return cuda.is_available()
+
+# Page-locked upload buffer of a worker process, kept between tiles and grown only for a larger tile
+_pinned_buffer = None
+
+def _pinned_copy(arr):
+    """
+    Copies arr into the worker's page-locked upload buffer, allocating it only when it is too small.
+
+    Parameters:
+        arr (numpy.ndarray): Array to upload.
+
+    Returns:
+        numpy.ndarray: View of the buffer with the shape and contents of arr.
+    """
+    global _pinned_buffer
+    if _pinned_buffer is None or _pinned_buffer.size < arr.size or _pinned_buffer.dtype != arr.dtype:
+        _pinned_buffer = cuda.pinned_array(arr.size, dtype=arr.dtype)
+    host = _pinned_buffer[:arr.size].reshape(arr.shape)
+    host[:] = arr
+    return host
+
+def _focal_means_cuda(arr, pad, radii, neighborhood):
+    """
+    Runs _focal_mean_cuda for several radii from a single upload of the padded tile.
+    The tile is uploaded from the worker's reused pinned buffer on one stream; the results are copied
+    into ordinary arrays since they are sent straight back to the parent process.
+
+    Parameters:
+        arr (numpy.ndarray): Input array padded by pad cells on every side.
+        pad (int): Padding of arr, at least the largest radius.
+        radii (list): Neighborhood radii in cells.
+        neighborhood (str): "CIRCLE" or "RECTANGLE".
+
+    Returns:
+        list of numpy.ndarray (float32) in the order of radii, with the padding removed.
+    """
+    rows = arr.shape[0] - 2 * pad
+    cols = arr.shape[1] - 2 * pad
+    threadsperblock = (16, 16)
+    blockspergrid = (math.ceil(rows / threadsperblock[0]), math.ceil(cols / threadsperblock[1]))
+
+    stream = cuda.stream()
+    d_arr = cuda.to_device(_pinned_copy(arr), stream=stream)
+
+    results = []
+    for radius in radii:
+        trim = pad - radius
+        d_mask = cuda.to_device(_neighborhood_mask(radius, neighborhood), stream=stream)
+        d_out = cuda.device_array((rows, cols), dtype='float32', stream=stream)
+        _focal_mean_cuda[blockspergrid, threadsperblock, stream](d_arr[trim:arr.shape[0] - trim, trim:arr.shape[1] - trim], d_mask, d_out)
+        out = np.empty((rows, cols), dtype='float32')
+        d_out.copy_to_host(out, stream=stream)
+        results.append(out)
+    stream.synchronize()
+    return results
+
+def _summed_area_tables(arr):
+    """
+    Summed-area tables of the values and of the number of valid cells, each with a leading row and column of zeros.
+
+    Parameters:
+        arr (numpy.ndarray): Input array, NoData as NaN.
+
+    Returns:
+        tuple: (sums, counts) as float64 arrays of shape (rows + 1, cols + 1)
+    """
+    valid = ~np.isnan(arr)
+    sums = np.zeros((arr.shape[0] + 1, arr.shape[1] + 1))
+    sums[1:, 1:] = np.where(valid, arr, 0).cumsum(0, dtype='float64').cumsum(1)
+    counts = np.zeros((arr.shape[0] + 1, arr.shape[1] + 1))
+    counts[1:, 1:] = valid.cumsum(0, dtype='float64').cumsum(1)
+    return sums, counts
+
+def _focal_mean_sat(tables, pad, radius, neighborhood):
+    """
+    Neighborhood mean computed from summed-area tables, ignoring NaN.
+    Each output cell costs one 4-corner difference per rectangle of the neighborhood instead of one add per cell.
+
+    Parameters:
+        tables (tuple): Output of _summed_area_tables.
+        pad (int): Padding of the array the tables were built from, at least radius.
+        radius (int): Neighborhood radius in cells.
+        neighborhood (str): "CIRCLE" or "RECTANGLE".
+
+    Returns:
+        numpy.ndarray (float32) with the padding removed.
+    """
+    sums, counts = tables
+    rows = sums.shape[0] - 1 - 2 * pad
+    cols = sums.shape[1] - 1 - 2 * pad
+    total = np.zeros((rows, cols))
+    count = np.zeros((rows, cols))
+    for top, bottom, half_width in _neighborhood_rectangles(radius, neighborhood):
+        r0, r1 = pad + top, pad + bottom + 1
+        c0, c1 = pad - half_width, pad + half_width + 1
+        for sat, acc in ((sums, total), (counts, count)):
+            acc += sat[r1:r1 + rows, c1:c1 + cols] - sat[r0:r0 + rows, c1:c1 + cols] - sat[r1:r1 + rows, c0:c0 + cols] + sat[r0:r0 + rows, c0:c0 + cols]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return (total / count).astype('float32')
+
+def _focal_tile(path, window, radii, neighborhood, gpu_max_radius=_SAT_MIN_RADIUS):
+    """
+    Worker for apply_focal_statistics. Reads one tile padded by the largest radius and computes the focal mean for every radius from that single read.
+
+    Parameters:
+        path (str): Path to the input raster.
+        window (Window): Tile of the output rasters to compute.
+        radii (list): Neighborhood radii in cells.
+        neighborhood (str): "CIRCLE" or "RECTANGLE".
+        gpu_max_radius (int): Largest radius computed with the direct kernel on the GPU when one is available.
+
+    Returns:
+        tuple: (window, list of numpy.ndarray in the order of radii)
+    """
+    pad = max(radii)
+    arr = _read_padded(path, window, pad)
+
+    # Radii up to gpu_max_radius use the direct kernel on the GPU when one is available
+    results = {}
+    gpu = [radius for radius in radii if radius <= gpu_max_radius]
+    if gpu and _cuda_available():
+        results.update(zip(gpu, _focal_means_cuda(arr, pad, gpu, neighborhood)))
+
+    # The other radii run on the CPU, small ones with the direct kernel and larger ones with the summed-area table
+
+    tables = None
+    for radius in radii:
+        if radius in results:
+            continue
+        if radius > _SAT_MIN_RADIUS:
+            if tables is None:
+                tables = _summed_area_tables(arr)
+            results[radius] = _focal_mean_sat(tables, pad, radius, neighborhood)
+        else:
+            trim = pad - radius
+            out = np.empty((int(window.height), int(window.width)), dtype='float32')
+            _focal_mean(arr[trim:arr.shape[0] - trim, trim:arr.shape[1] - trim], _neighborhood_mask(radius, neighborhood), out)
+            results[radius] = out
+    return window, [results[radius] for radius in radii]
+
+def apply_focal_statistics(input_folder, output_folder, radius, statistic_type="MEAN", neighborhood="CIRCLE", tile_size=1024, max_workers=None, gpu_max_radius=_SAT_MIN_RADIUS):
     """
     Applies focal statistics with a specified radius and statistic type to all rasters in a folder.
-    
+    Rasters are split into tiles which are processed in parallel, so rasters larger than memory can be used.
+    Each tile is read once and used for every radius. When a CUDA GPU is available, radii up to gpu_max_radius
+    are computed on it. By default the GPU is never used above 5 cells, the CPU cut-over to the summed-area table;
+    the GPU has not been timed against that table, so raise gpu_max_radius only after measuring on the target GPU.
+    Each worker process opens its own GPU context, so lower max_workers if GPU memory runs out.
+
     Parameters:
         input_folder (str): The folder containing the input rasters.
         output_folder (str): The folder where the output rasters will be saved.
         radius (list): The radius distance for the focal operation.
-        statistic_type (str): The statistic to apply (default is "MEAN").
-        
+        statistic_type (str): The statistic to apply (default is "MEAN"). Only "MEAN" is supported.
+        neighborhood (str): "CIRCLE" (NbrCircle) or "RECTANGLE", a square of side 2 * radius + 1 (default is "CIRCLE").
+        tile_size (int): Approximate tile edge length in cells (default is 1024).
+        max_workers (int): Number of worker processes (default is os.cpu_count()).
+        gpu_max_radius (int): Largest radius computed on the GPU when one is available (default is 5).
+
     Returns:
         None
     """
-    # Set up environment settings
-    arcpy.env.workspace = input_folder
-    arcpy.env.overwriteOutput = True
-    
+    if statistic_type != "MEAN":
+        raise ValueError(f"Unsupported statistic type: {statistic_type}")
+    if neighborhood not in _NEIGHBORHOODS:
+        raise ValueError(f"Unsupported neighborhood: {neighborhood}")
+
     # List all rasters in the input folder
-    rasters = arcpy.ListRasters()
-    
+    rasters = _list_rasters(input_folder)
+
     # Ensure the output folder exists
-    if not os.path.exists(output_folder):
-        os.makedirs(output_folder)
-    
-    # Process each raster
+    _ensure_folder(output_folder)
+
+    # Read the raster headers first so the block cache can be sized before the workers start
+    jobs = []
+    cache_blocks = 1
     for raster in rasters:
+        input_raster = os.path.join(input_folder, raster)
+        
+        # Only compute the radii whose output is missing, older than the input or made with other settings
+        radii = []
         for rad in radius:
-            # Define output raster path
             output_raster = os.path.join(output_folder, f"focal_{rad}_{os.path.splitext(raster)[0]}.tif")
-            
-            # Apply Focal Statistics with specified radius and statistic type
-            focal_raster = arcpy.sa.FocalStatistics(
-                in_raster=raster,
-                neighborhood=arcpy.sa.NbrCircle(rad, "CELL"),
-                statistics_type=statistic_type
-            )
-            
-            # Save the output raster
-            focal_raster.save(output_raster)
-            print(f"Processed {raster} with radius {rad} and saved to {output_raster}")
+            if _up_to_date(output_raster, [input_raster], statistic_type=statistic_type, neighborhood=neighborhood):
+                print(f"Skipped {raster} with radius {rad} (up-to-date)")
+            else:
+                radii.append(rad)
+        if not radii:
+            continue
+        
+        with rasterio.open(input_raster) as src:
+            profile = _output_profile(src.profile, 'float32')
+            windows = list(_tile_windows(src, tile_size))
+            cache_blocks = max(cache_blocks, _block_cache_size(src, windows[0], max(radii)))
+        profile.update(count=1, nodata=np.nan)
+        jobs.append((raster, input_raster, profile, windows, radii))
+
+    # Nothing to compute when every output is up to date
+    if not jobs:
+        return
+
+    # Process each raster, sharing the cores between worker processes and Numba threads
+    max_workers = max_workers or os.cpu_count()
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(max(1, os.cpu_count() // max_workers), cache_blocks)) as executor, \
+            ThreadPoolExecutor(max_workers=max(len(radii) for *_, radii in jobs)) as writer:
+        for raster, input_raster, profile, windows, radii in jobs:
+            # Define output raster paths
+            output_rasters = [os.path.join(output_folder, f"focal_{rad}_{os.path.splitext(raster)[0]}.tif") for rad in radii]
+
+            # Send runs of neighboring tiles to one worker so they hit its block cache, but keep the runs short
+            # enough that every worker gets tiles, and write every radius of a tile concurrently as it completes
+            tiles_per_row = sum(1 for window in windows if window.row_off == 0)
+            chunksize = max(1, min(tiles_per_row, len(windows) // max_workers))
+            tiles = executor.map(partial(_focal_tile, input_raster, radii=radii, neighborhood=neighborhood, gpu_max_radius=gpu_max_radius), windows, chunksize=chunksize)
+            with ExitStack() as stack:
+                dsts = [stack.enter_context(rasterio.open(output_raster, 'w', **profile)) for output_raster in output_rasters]
+                for window, results in tiles:
+                    list(writer.map(lambda dst, data: dst.write(data, 1, window=window), dsts, results))
+                list(writer.map(_build_overviews, dsts))
+                for dst in dsts:
+                    dst.update_tags(statistic_type=statistic_type, neighborhood=neighborhood)
+
+            for rad, output_raster in zip(radii, output_rasters):
+                print(f"Processed {raster} with radius {rad} and saved to {output_raster}")
     
+# Number of fishnet cells built and written at once by create_fishnet
+_FISHNET_BAND_CELLS = 1_000_000
+
 def create_fishnet(input_raster, output_folder, output_name):
     """
-    Generates fishnet from existing raster (aka CAPA temperature raster). 
+    Generates fishnet from existing raster (aka CAPA temperature raster) with one polygon per cell,
+    plus a point layer of cell centres (<output_name>_label.shp) like CreateFishnet's LABELS option.
     https://pro.arcgis.com/en/pro-app/latest/tool-reference/data-management/how-create-fishnet-works.htm
     
     Parameters:
-        input_raster (Raster): Input raster. Raster's extent and number of columns and rows will be used to create fishnet.
+        input_raster (str): Input raster. Raster's extent and number of columns and rows will be used to create fishnet.
         output_folder (str): The folder where the output layers will be stored.
         output_name (str): The file name of the new fishnet. 
     Returns:
         None
     """
     # Ensure the output folder exists
-    if not os.path.exists(output_folder):
-        os.makedirs(output_folder)    
+    _ensure_folder(output_folder)    
         
-    # Define existing raster extent and parameters
-    raster_left = arcpy.GetRasterProperties_management(input_raster, "LEFT")
-    raster_bottom = arcpy.GetRasterProperties_management(input_raster, "BOTTOM")
-    raster_right = arcpy.GetRasterProperties_management(input_raster, "RIGHT")
-    raster_top = arcpy.GetRasterProperties_management(input_raster, "TOP")
-    raster_ncols = arcpy.GetRasterProperties_management(input_raster, "COLUMNCOUNT")
-    raster_nrows = arcpy.GetRasterProperties_management(input_raster, "ROWCOUNT")
+    # Define existing raster extent and parameters from a single header read
+    with rasterio.open(input_raster) as src:
+        left, bottom, right, top = src.bounds
+        ncols, nrows = src.width, src.height
+        crs = src.crs
+    
+    # Cell corner coordinates, rows ordered from the top like the raster
+    xs = left + np.arange(ncols + 1) * ((right - left) / ncols)
+    ys = top - np.arange(nrows + 1) * ((top - bottom) / nrows)
     
-    # Create Fishnet
-    arcpy.management.CreateFishnet(
-        out_feature_class= os.path.join(output_folder, 'output_name'), 
-        origin_coord= f"{raster_left.getOutput(0)} {raster_bottom.getOutput(0)}", 
-        y_axis_coord= f"{raster_left.getOutput(0)} {int(raster_bottom.getOutput(0))+10}", 
-        cell_width=10,
-        cell_height=10,
-        number_rows=raster_nrows,
-        number_columns=raster_ncols,
-        labels="LABELS",
-        geometry_type="POLYLINE"
-    )
+    # Create Fishnet and cell centre labels in bands of rows, appending each band to the layers,
+    # so only one band of geometries is in memory at a time
+    fishnet = os.path.join(output_folder, f"{output_name}.shp")
+    label = os.path.join(output_folder, f"{output_name}_label.shp")
+    centres = (xs[:-1] + xs[1:]) / 2
+    band_rows = max(1, _FISHNET_BAND_CELLS // ncols)
+    for start in range(0, nrows, band_rows):
+        band = ys[start:start + band_rows + 1]
+        mode = 'w' if start == 0 else 'a'
+        cells = shapely.box(xs[None, :-1], band[1:, None], xs[None, 1:], band[:-1, None]).ravel()
+        gpd.GeoDataFrame(geometry=cells, crs=crs).to_file(fishnet, driver="ESRI Shapefile", mode=mode)
+        del cells
+        labels = shapely.points(centres[None, :], ((band[:-1] + band[1:]) / 2)[:, None]).ravel()
+        gpd.GeoDataFrame(geometry=labels, crs=crs).to_file(label, driver="ESRI Shapefile", mode=mode)
+        del labels
     print(f"Processed {input_raster}. Fishnet {output_name} saved to {output_folder}")
     
+def _field_name(raster):
+    """
+    Builds the point field name for a focal raster, e.g. focal_10_..._B04.tif becomes B04_100m.
+
+    Parameters:
+        raster (str): Raster file name.
+
+    Returns:
+        str
+    """
+    nameparts = raster.split('.')[0].split('_')
+    return nameparts[-1] + '_' + nameparts[1] + '0m' #nameparts[0] + nameparts[1] + '_' + nameparts[-1]
+
+def _cell_index(transform, shape, xs, ys):
+    """
+    Finds the raster cell containing each point using the inverse of the raster's affine transform.
+
+    Parameters:
+        transform (Affine): Raster transform.
+        shape (tuple): Raster (rows, cols).
+        xs (numpy.ndarray): Point x coordinates in the raster's CRS.
+        ys (numpy.ndarray): Point y coordinates in the raster's CRS.
+
+    Returns:
+        tuple: (rows, cols, inside) where inside marks the points that fall on the raster.
+    """
+    cols, rows = ~transform * (xs, ys)
+    rows = np.floor(rows).astype('int32')
+    cols = np.floor(cols).astype('int32')
+    inside = (rows >= 0) & (rows < shape[0]) & (cols >= 0) & (cols < shape[1])
+    return rows, cols, inside
+
+def stack_rasters(input_folder, output_raster, tile_size=1024):
+    """
+    Stacks all rasters in a folder into one multi-band GeoTIFF so they can be sampled with a single open and read.
+    Each band is described with the name of its source raster. All rasters must share the same grid.
+    
+    Parameters:
+        input_folder (str): The folder containing the input rasters (e.g. the focal rasters).
+        output_raster (str): Path of the stacked raster.
+        tile_size (int): Approximate tile edge length in cells used while copying (default is 1024).
+        
+    Returns:
+        None
+    """
+    # List all rasters in the input folder
+    rasters = _list_rasters(input_folder)
+    if not rasters:
+        raise ValueError(f"No rasters found in {input_folder}")
+    
+    # Skip if the stack is newer than every raster and holds the same bands
+    bands = ';'.join(os.path.splitext(raster)[0] for raster in rasters)
+    if _up_to_date(output_raster, [os.path.join(input_folder, raster) for raster in rasters], bands=bands):
+        print(f"Skipped {output_raster} (up-to-date)")
+        return
+    
+    with rasterio.open(os.path.join(input_folder, rasters[0])) as src:
+        profile = _output_profile(src.profile, src.dtypes[0])
+        grid = (src.crs, src.transform, src.shape)
+    profile.update(count=len(rasters))
+    
+    # Ensure the output folder exists
+    _ensure_folder(os.path.dirname(output_raster))
+    
+    # Copy each raster into its own band, tile by tile
+    with rasterio.open(output_raster, 'w', **profile) as dst:
+        for band, raster in enumerate(rasters, start=1):
+            with rasterio.open(os.path.join(input_folder, raster)) as src:
+                if (src.crs, src.transform, src.shape) != grid:
+                    raise ValueError(f"{raster} does not share the grid of the other rasters")
+                for window in _tile_windows(src, tile_size):
+                    dst.write(src.read(1, window=window), band, window=window)
+            dst.set_band_description(band, os.path.splitext(raster)[0])
+        _build_overviews(dst)
+        dst.update_tags(bands=bands)
+    print(f"Stacked {len(rasters)} rasters and saved to {output_raster}")
+
+@njit(nogil=True, cache=True)
+def _gather(block, rows, cols, targets, nodata, out):
+    """
+    Copies the cells of a block at the given points into their columns of out. NoData becomes NaN.
+
+    Parameters:
+        block (numpy.ndarray): Block of shape (bands, rows, cols).
+        rows (numpy.ndarray): Block-local cell row of each point.
+        cols (numpy.ndarray): Block-local cell column of each point.
+        targets (numpy.ndarray): Column of out for each point.
+        nodata (numpy.ndarray): NoData value of each band, NaN if none.
+        out (numpy.ndarray): Values of shape (bands, points) to fill.
+    """
+    for band in range(block.shape[0]):
+        for i in range(rows.size):
+            value = block[band, rows[i], cols[i]]
+            out[band, targets[i]] = np.nan if value == nodata[band] else value
+
+def _sample(path, rows, cols, targets, out):
+    """
+    Samples every band of a raster at precomputed cells. Points are grouped by the internal block they fall in
+    and only those blocks are read, so sparse points over a large raster do not read the whole raster.
+    Safe to run in threads as long as each thread fills its own rows of values.
+
+    Parameters:
+        path (str): Path to the raster.
+        rows (numpy.ndarray): Cell row of each point inside the raster.
+        cols (numpy.ndarray): Cell column of each point inside the raster.
+        targets (numpy.ndarray): Index of each of those points in the point layer.
+        out (numpy.ndarray): Values of shape (bands, points) to fill. Points outside the raster are left untouched.
+
+    Returns:
+        None
+    """
+    with rasterio.open(path) as src:
+        nodata = np.array([np.nan if value is None else value for value in src.nodatavals], dtype='float64')
+        
+        # Sort the points by block and find where each block's group starts
+        block_rows, block_cols = src.block_shapes[0]
+        point_block_rows, point_block_cols = rows // block_rows, cols // block_cols
+        order = np.lexsort((point_block_cols, point_block_rows))
+        keys = point_block_rows[order].astype('int64') * (src.width // block_cols + 1) + point_block_cols[order]
+        _, starts = np.unique(keys, return_index=True)
+        
+        # Read each block that holds points once and gather its points with block-local offsets
+        for start, stop in zip(starts, np.append(starts[1:], keys.size)):
+            group = order[start:stop]
+            top = point_block_rows[group[0]] * block_rows
+            left = point_block_cols[group[0]] * block_cols
+            window = Window(left, top, min(block_cols, src.width - left), min(block_rows, src.height - top))
+            _gather(src.read(window=window), rows[group] - top, cols[group] - left, targets[group], nodata, out)
+
+def _replace_layer(temp, output):
+    """
+    Moves a layer written under a temporary name into place. Sidecar files (.dbf, .shx, ...) are moved first
+    and the main file last, so the output only becomes newer than its inputs once every part is replaced.
+
+    Parameters:
+        temp (str): Path the layer was written to.
+        output (str): Final path of the layer, in the same folder.
+
+    Returns:
+        None
+    """
+    temp, output = Path(temp), Path(output)
+    parts = [part for part in temp.parent.iterdir() if part.name.startswith(temp.stem + '.')]
+    for part in sorted(parts, key=lambda part: part == temp):
+        os.replace(part, output.with_name(output.stem + part.name[len(temp.stem):]))
+
 def extract_values(in_points_file, rasters_folder, output_folder, output_file):
     """
-    Extracts cell values at point features.
+    Extracts cell values at point features. Equivalent to ExtractMultiValuesToPoints without interpolation.
+    Every band of a multi-band raster (see stack_rasters) becomes its own field.
     https://pro.arcgis.com/en/pro-app/latest/tool-reference/spatial-analyst/extract-multi-values-to-points.htm 
     
     Parameters:
-        in_points_file (FeatureLayer): Input point features to which data will be added. Original is copied.
-        input_folder (str): The folder containing the input rasters.
+        in_points_file (str): Input point features to which data will be added. Original is not modified.
+        rasters_folder (str): The folder containing the input rasters.
         output_folder (str): The folder where the output layer will be stored.
+        output_file (str): The file name of the output layer.
         
     Returns:
         None
     """
     # Ensure the output folder exists
-    if not os.path.exists(output_folder):
-        os.makedirs(output_folder)
+    _ensure_folder(output_folder)
  
     output = os.path.join(output_folder, output_file)
-    arcpy.management.CopyFeatures(in_points_file, output) 
-        
-    # Set up environment settings
-    arcpy.env.workspace = rasters_folder
-    arcpy.env.overwriteOutput = True
     
     # List all rasters in the input folder
-    rasters = arcpy.ListRasters()
+    rasters = _list_rasters(rasters_folder)
+    if not rasters:
+        raise ValueError(f"No rasters found in {rasters_folder}")
     
-    # Create list of lists for each raster...
-    inRasterList = []
+    # Every focal raster shares the grid of the first one
+    with rasterio.open(os.path.join(rasters_folder, rasters[0])) as src:
+        grid = (src.crs, src.transform, src.shape)
+
+    # Read the raster headers to give every field a row of values; stacked rasters hold one field per band
+    fieldnames = []
+    offsets = [0]
     for raster in rasters:
-        # Define Raster name and new field for point shapefile
-        name = raster.split('.')[0]
-        nameparts = name.split('_')
-        new_fieldname = nameparts[-1] + '_' + nameparts[1] + '0m' #nameparts[0] + nameparts[1] + '_' + nameparts[-1]
-        inRasterList.append([raster, new_fieldname])
-    print(inRasterList)    
-    arcpy.sa.ExtractMultiValuesToPoints(output, inRasterList, "NONE")           
-    print(f"Processed {len(inRasterList)} rasters. And saved to {output}") 
+        with rasterio.open(os.path.join(rasters_folder, raster)) as src:
+            if (src.crs, src.transform, src.shape) != grid:
+                raise ValueError(f"{raster} does not share the grid of the other rasters")
+            # Stacked rasters name each band after its source raster
+            fieldnames.extend(_field_name(description or raster) for description in src.descriptions)
+        offsets.append(len(fieldnames))
+    print(fieldnames)
+
+    # Skip if the output is newer than the points and every raster and holds exactly their fields,
+    # so a raster removed from the folder is noticed as well
+    if _up_to_date(output, [in_points_file] + [os.path.join(rasters_folder, raster) for raster in rasters]) and \
+            set(gpd.read_file(output, rows=0).columns) == set(gpd.read_file(in_points_file, rows=0).columns) | set(fieldnames):
+        print(f"Skipped {output} (up-to-date)")
+        return
+    points = gpd.read_file(in_points_file)
+
+    # Map the points to cells once
+    geometry = points.geometry if points.crs is None or points.crs == grid[0] else points.geometry.to_crs(grid[0])
+    rows, cols, inside = _cell_index(grid[1], grid[2], geometry.x.values, geometry.y.values)
+    rows, cols, targets = rows[inside], cols[inside], np.flatnonzero(inside)
+
+    # Sample every raster at every point into its own rows of values, reading the rasters in parallel threads
+    values = np.full((len(fieldnames), len(points)), np.nan, dtype='float32')
+    with ThreadPoolExecutor(max_workers=min(16, len(rasters))) as executor:
+        futures = [executor.submit(_sample, os.path.join(rasters_folder, raster), rows, cols, targets, values[start:stop])
+                   for raster, start, stop in zip(rasters, offsets, offsets[1:])]
+        for future in futures:
+            future.result()
+    for i, name in enumerate(fieldnames):
+        points[name] = values[i]
+
+    # Write under a temporary name and move it into place, so an interrupted write never looks up to date
+    temp = os.path.join(output_folder, f"~{output_file}")
+    points.to_file(temp)
+    _replace_layer(temp, output)
+    print(f"Processed {len(rasters)} rasters. And saved to {output}") 
     
 def create_boundingBox(feature_classes):
     """
@@ -222,58 +961,59 @@ def grid_to_points(input_raster):
     """
     pass
 
-# CREATE PROJECT
-project_dir = r'C:\Users\bm233557\Documents\GradSchool\Climate\Project'
-#create_file_structure(project_dir)
-
-# DEFINE FILE DIRECTORIES
-raw_raster_folder = os.path.join(project_dir, 'sentinel_rasters') # r"C:\Users\bm233557\Downloads\Browser_images (2)"
-#output_folder = # r"C:\Users\bm233557\Downloads\TEST"
-resample_folder = os.path.join(project_dir, "resampled_rasters")
-focal_stats_folder = os.path.join(project_dir, "focal_rasters")
-transverse_folder = os.path.join(project_dir, 'CAPA_transects') #r"C:\Users\bm233557\Downloads\traverses_chw_columbia_092222 (1)"
-CAPA_raster_folder = os.path.join(project_dir, 'CAPA_rasters') #r'C:\Users\bm233557\Downloads\rasters_chw_columbia_101722'
-
-
-# PROCESS RASTERS
-#rename_rasters(raw_raster_folder)
-#apply_resampling(raw_raster_folder, resample_folder, "10 10")
-# Measured in Cells we use 10m cells, so multiply by 10. Literature uses 0 m, 100 m, 150 m, 200 m, 250 m, 300 m, 350 m, 400 m, 450  m,  500  m,  600  m,  700  m,  800  m,  900  m,  and  1000  m
-radius = [10,15,20,25,30,35,40,45,50,60,70,80,90,100] 
-#apply_focal_statistics(resample_folder, focal_stats_folder, radius)
+if __name__ == "__main__":
+    # CREATE PROJECT
+    project_dir = r'C:\Users\bm233557\Documents\GradSchool\Climate\Project'
+    #create_file_structure(project_dir)
 
-utm_spatial_ref = arcpy.SpatialReference(32617)
+    # DEFINE FILE DIRECTORIES
+    raw_raster_folder = os.path.join(project_dir, 'sentinel_rasters') # r"C:\Users\bm233557\Downloads\Browser_images (2)"
+    #output_folder = # r"C:\Users\bm233557\Downloads\TEST"
+    resample_folder = os.path.join(project_dir, "resampled_rasters")
+    focal_stats_folder = os.path.join(project_dir, "focal_rasters")
+    stacked_folder = os.path.join(project_dir, "stacked_rasters")
+    transverse_folder = os.path.join(project_dir, 'CAPA_transects') #r"C:\Users\bm233557\Downloads\traverses_chw_columbia_092222 (1)"
+    CAPA_raster_folder = os.path.join(project_dir, 'CAPA_rasters') #r'C:\Users\bm233557\Downloads\rasters_chw_columbia_101722'
 
-# Define location of CAPA transverse data
 
-am_shp = os.path.join(transverse_folder, 'am_trav.shp')
-af_shp = os.path.join(transverse_folder, 'af_trav.shp')
-pm_shp = os.path.join(transverse_folder, 'pm_trav.shp')
+    # PROCESS RASTERS
+    #rename_rasters(raw_raster_folder)
+    #apply_resampling(raw_raster_folder, resample_folder, "10 10")
+    # Measured in Cells we use 10m cells, so multiply by 10. Literature uses 0 m, 100 m, 150 m, 200 m, 250 m, 300 m, 350 m, 400 m, 450  m,  500  m,  600  m,  700  m,  800  m,  900  m,  and  1000  m
+    radius = [10,15,20,25,30,35,40,45,50,60,70,80,90,100] 
+    #apply_focal_statistics(resample_folder, focal_stats_folder, radius)
+    # Stack the focal rasters so each extraction opens and reads a single file
+    stack_rasters(focal_stats_folder, os.path.join(stacked_folder, 'focal_stack.tif'))
 
-trans_data = [am_shp, af_shp, pm_shp]
+    utm_spatial_ref = CRS.from_epsg(32617)
 
-# Define location of CAPA Rasters   
-capa_am_t_raster = os.path.join(CAPA_raster_folder, 'am_t_f.tif')
-capa_am_hi_raster = os.path.join(CAPA_raster_folder, 'am_hi_f.tif')
-capa_af_t_raster = os.path.join(CAPA_raster_folder, 'af_t_f.tif')
-capa_af_hi_raster = os.path.join(CAPA_raster_folder, 'af_hi_f.tif')
-capa_pm_t_raster = os.path.join(CAPA_raster_folder, 'pm_t_f.tif')
-capa_pm_hi_raster = os.path.join(CAPA_raster_folder, 'pm_hi_f.tif')
+    # Define location of CAPA transverse data
 
-# CREATE FISHNET *** THIS TAKES A LONG TIME TO RUN ***
-# fishnet_folder = os.path.join(output_folder, "Fishnet")
-# create_fishnet(capa_am_t_raster, fishnet_folder, 'Fishnet')
+    am_shp = os.path.join(transverse_folder, 'am_trav.shp')
+    af_shp = os.path.join(transverse_folder, 'af_trav.shp')
+    pm_shp = os.path.join(transverse_folder, 'pm_trav.shp')
 
+    trans_data = [am_shp, af_shp, pm_shp]
 
-# # EXTRACT RASTER VALUE FOR POINT
-processed_transects_folder = os.path.join(project_dir, 'shapefiles') #r'C:\Users\bm233557\Downloads\TEST\Points'
-am_shp_w_rasterdata = r'am_output.shp'
-af_shp_w_rasterdata = r'af_output.shp'
-pm_shp_w_rasterdata = r'pm_output.shp'
+    # Define location of CAPA Rasters   
+    capa_am_t_raster = os.path.join(CAPA_raster_folder, 'am_t_f.tif')
+    capa_am_hi_raster = os.path.join(CAPA_raster_folder, 'am_hi_f.tif')
+    capa_af_t_raster = os.path.join(CAPA_raster_folder, 'af_t_f.tif')
+    capa_af_hi_raster = os.path.join(CAPA_raster_folder, 'af_hi_f.tif')
+    capa_pm_t_raster = os.path.join(CAPA_raster_folder, 'pm_t_f.tif')
+    capa_pm_hi_raster = os.path.join(CAPA_raster_folder, 'pm_hi_f.tif')
 
-extract_values(am_shp, focal_stats_folder, processed_transects_folder, am_shp_w_rasterdata)
-extract_values(af_shp, focal_stats_folder, processed_transects_folder, af_shp_w_rasterdata)
-extract_values(pm_shp, focal_stats_folder, processed_transects_folder, pm_shp_w_rasterdata)
+    # CREATE FISHNET
+    # fishnet_folder = os.path.join(output_folder, "Fishnet")
+    # create_fishnet(capa_am_t_raster, fishnet_folder, 'Fishnet')
 
 
+    # # EXTRACT RASTER VALUE FOR POINT
+    processed_transects_folder = os.path.join(project_dir, 'shapefiles') #r'C:\Users\bm233557\Downloads\TEST\Points'
+    am_shp_w_rasterdata = r'am_output.shp'
+    af_shp_w_rasterdata = r'af_output.shp'
+    pm_shp_w_rasterdata = r'pm_output.shp'
 
+    extract_values(am_shp, stacked_folder, processed_transects_folder, am_shp_w_rasterdata)
+    extract_values(af_shp, stacked_folder, processed_transects_folder, af_shp_w_rasterdata)
+    extract_values(pm_shp, stacked_folder, processed_transects_folder, pm_shp_w_rasterdata)